@@ -4,8 +4,209 @@ Answers doctor questions using only explanation JSON and evidence.
 Never invents information - strictly grounded in provided data.
 """
 import json
-from typing import Dict, Any, List, Optional
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Any, Iterator, List, Optional, Set
 import re
+import sys
+
+from config import CHAT_CONFIG
+
+
+# Explanation section keys, also used as response source names
+_K_DECISION = sys.intern("decision_explanation")
+_K_UNCERTAINTY = sys.intern("uncertainty_analysis")
+_K_FEATURES = sys.intern("feature_contributions")
+_K_ALTERNATIVES = sys.intern("alternative_classes")
+_K_ALL_PREDICTIONS = sys.intern("all_predictions")
+_K_QUALITY = sys.intern("data_quality")
+_K_CLINICAL = sys.intern("clinical_context")
+
+# Shared sources tuples for responses
+_SRC_DECISION = (_K_DECISION,)
+_SRC_CONFIDENCE = (_K_DECISION, _K_UNCERTAINTY)
+_SRC_WHY = (_K_DECISION, _K_FEATURES)
+_SRC_FEATURES = (_K_FEATURES,)
+_SRC_ALTERNATIVES = (_K_ALTERNATIVES, _K_ALL_PREDICTIONS)
+_SRC_QUALITY = (_K_QUALITY,)
+_SRC_RECOMMENDATION = (_K_CLINICAL, _K_DECISION)
+_SRC_UNCERTAINTY = (_K_UNCERTAINTY,)
+_SRC_CLINICAL = (_K_CLINICAL,)
+
+# Joined source names for display, built once from the tuples above
+_SRC_DECISION_STR = ", ".join(_SRC_DECISION)
+_SRC_CONFIDENCE_STR = ", ".join(_SRC_CONFIDENCE)
+_SRC_WHY_STR = ", ".join(_SRC_WHY)
+_SRC_FEATURES_STR = ", ".join(_SRC_FEATURES)
+_SRC_ALTERNATIVES_STR = ", ".join(_SRC_ALTERNATIVES)
+_SRC_QUALITY_STR = ", ".join(_SRC_QUALITY)
+_SRC_RECOMMENDATION_STR = ", ".join(_SRC_RECOMMENDATION)
+_SRC_UNCERTAINTY_STR = ", ".join(_SRC_UNCERTAINTY)
+_SRC_CLINICAL_STR = ", ".join(_SRC_CLINICAL)
+
+
+def _group_routes(keyword_routes):
+    """Group (keyword, handler) pairs into (keyword set, handler method) routes, keeping priority order"""
+    grouped = {}
+    for keyword, handler in keyword_routes:
+        grouped.setdefault(f"_handle_{handler}_question", set()).add(keyword)
+    return tuple((frozenset(keywords), handler) for handler, keywords in grouped.items())
+
+
+# Routing table in priority order: (keyword set, handler name)
+_ROUTES = _group_routes(CHAT_CONFIG["keyword_routes"])
+
+
+def _build_keyword_router(routes):
+    """Compile all route keywords into one alternation plus a keyword -> priority map"""
+    priority = {}
+    for idx, (keywords, _) in enumerate(routes):
+        for keyword in keywords:
+            priority.setdefault(keyword, idx)
+    # Longest first so multi-word phrases win over their prefixes; inflected
+    # forms still match ("gliomas", "reasoning", "explained") and only the
+    # keyword itself is captured
+    alternation = "|".join(re.escape(kw) for kw in sorted(priority, key=len, reverse=True))
+    return re.compile(rf"\b({alternation})\w*"), priority
+
+
+_KEYWORD_RE, _KEYWORD_PRIORITY = _build_keyword_router(_ROUTES)
+_TOKEN_RE = re.compile(r"[a-z]+")
+_TUMOR_TYPES = ("glioma", "meningioma", "pituitary")
+_WS_RE = re.compile(r"\s+")
+
+
+def route(question: str) -> str:
+    """
+    Return the handler name for a normalized (lowercase) question
+    
+    One scan of the precompiled keyword matcher; the highest-priority
+    matching category wins, and unmatched questions go to the general handler.
+    """
+    matches = _KEYWORD_RE.findall(question)
+    if matches:
+        return _ROUTES[min(_KEYWORD_PRIORITY[kw] for kw in matches)][1]
+    return "_handle_general_question"
+
+
+# Public short handler names ("diagnosis", "confidence", ...) -> handler method
+HANDLER_NAMES = {
+    handler[len("_handle_"):-len("_question")]: handler
+    for handler in [handler for _, handler in _ROUTES] + ["_handle_general_question"]
+}
+
+
+def route_name(question: str) -> str:
+    """Return the public short handler name for a normalized question"""
+    return route(question)[len("_handle_"):-len("_question")]
+
+
+# Constant answer templates
+_GENERAL_PREFIX_TMPL = (
+    "**Based on available model output:**\n\n"
+    "- Prediction: {pred}\n"
+    "- Confidence: {conf}%\n"
+    "- Reasoning: {reason}\n\n"
+)
+_GENERAL_SUFFIX = (
+    "For more specific information, please ask about:\n"
+    "- Diagnosis/prediction results\n"
+    "- Confidence and uncertainty\n"
+    "- Reasoning and features\n"
+    "- Alternative diagnoses\n"
+    "- Clinical recommendations\n"
+    "- Image quality\n"
+)
+_CONFIDENCE_TMPL = (
+    "**Confidence Score:** {confidence}%\n\n"
+    "**Confidence Level:** {level}\n\n"
+    "**Uncertainty Assessment:** {unc_level}\n\n"
+    "**Interpretation:** {interp}\n\n"
+    "**Technical Metrics:**\n"
+    "- Prediction Entropy: {entropy} (lower is more confident)\n"
+    "- Margin (top 2 classes): {margin} (higher is more confident)"
+)
+_DISPLAY_TMPL = "{answer}\n\n**Data Sources:** {sources}\n\n**Grounded in Evidence:** {grounded}"
+_DISPLAY_NO_SOURCES_TMPL = "{answer}\n\n**Grounded in Evidence:** {grounded}"
+_NOT_AVAILABLE_TEMPLATE = (
+    "**This information is not available in the model output.**\n\n"
+    "Context: {context}\n\n"
+    "The clinical chat agent can only provide information that was "
+    "generated during the model's prediction and explanation process. "
+    "This specific information was not included in the analysis."
+)
+
+
+def build_confidence_answer(confidence, level, unc_level, interp, entropy, margin) -> str:
+    """Build the confidence answer from already-extracted fields in one format call"""
+    return _CONFIDENCE_TMPL.format(
+        confidence=confidence,
+        level=level,
+        unc_level=unc_level,
+        interp=interp,
+        entropy=entropy,
+        margin=margin
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class Response:
+    """
+    Immutable chat answer.
+    
+    Supports read-only mapping access (response["answer"], "grounded" in
+    response, response.get(...)) over its fields and extra keys, so existing
+    dict-style callers keep working. Use to_dict() for JSON serialization.
+    """
+    answer: str
+    sources: tuple
+    grounded: bool
+    confidence: str
+    sources_str: str = ""
+    extra: Optional[Dict[str, Any]] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the response as a flat JSON-serializable dictionary"""
+        data = {
+            "answer": self.answer,
+            "sources": list(self.sources),
+            "grounded": self.grounded,
+            "confidence": self.confidence
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+    
+    def __getitem__(self, key: str) -> Any:
+        if key in _RESPONSE_FIELDS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in _RESPONSE_FIELDS or bool(self.extra and key in self.extra)
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+_RESPONSE_FIELDS = frozenset({"answer", "sources", "grounded", "confidence"})
+
+_NO_EXPLANATION_RESPONSE = Response(
+    answer="No explanation data loaded. Please run a prediction first.",
+    sources=(),
+    grounded=False,
+    confidence="N/A"
+)
+
+
+def _specific_tumor_type(tokens: Set[str]) -> Optional[str]:
+    """Return the first tumor type named (singular or plural) in the question tokens, if any"""
+    return next((t for t in _TUMOR_TYPES if t in tokens or t + "s" in tokens), None)
 
 
 class ClinicalChatAgent:
@@ -14,10 +215,55 @@ class ClinicalChatAgent:
     Forbidden to hallucinate - returns "not in model output" when info is missing.
     """
     
-    def __init__(self):
-        """Initialize the Clinical Chat Agent"""
+    # Explanation fields extracted by _flatten_explanation
+    _FLAT_FIELDS = (
+        "_predicted_class", "_confidence", "_confidence_level", "_reasoning", "_is_tumor",
+        "_uncertainty", "_entropy", "_margin", "_uncertainty_level", "_interpretation",
+        "_grad_cam_available", "_grad_cam_description", "_top_regions", "_visual_features",
+        "_alternatives", "_all_predictions", "_all_preds_block",
+        "_image_statistics", "_quality_issues", "_overall_quality",
+        "_recommendation", "_tumor_types", "_tumor_types_block", "_timestamp",
+    )
+    __slots__ = (
+        "explanation_data", "conversation_history", "_answer_cache", "_explanation_version",
+    ) + _FLAT_FIELDS
+    
+    # Top-level explanation section each handler cannot answer without
+    _REQUIRED_SECTIONS = {
+        "_handle_diagnosis_question": _K_DECISION,
+        "_handle_confidence_question": _K_DECISION,
+        "_handle_why_question": _K_DECISION,
+        "_handle_location_question": _K_FEATURES,
+        "_handle_alternatives_question": _K_ALL_PREDICTIONS,
+        "_handle_quality_question": _K_QUALITY,
+        "_handle_recommendation_question": _K_CLINICAL,
+        "_handle_uncertainty_question": _K_UNCERTAINTY,
+        "_handle_tumor_type_question": _K_CLINICAL,
+        "_handle_general_question": _K_DECISION,
+    }
+    
+    # Handlers whose answer text can be produced section by section
+    _STREAMS = {
+        "_handle_why_question": "_stream_why_answer",
+        "_handle_alternatives_question": "_stream_alternatives_answer",
+        "_handle_quality_question": "_stream_quality_answer",
+        "_handle_tumor_type_question": "_stream_tumor_type_answer",
+    }
+    
+    def __init__(self, max_history: int = 50):
+        """
+        Initialize the Clinical Chat Agent
+        
+        Args:
+            max_history: Maximum number of questions kept in conversation history
+        """
         self.explanation_data = None
-        self.conversation_history = []
+        self.conversation_history = deque(maxlen=max_history)
+        # Answers memoized per (explanation version, normalized question)
+        self._answer_cache: Dict[tuple, Response] = {}
+        self._explanation_version = 0
+        for name in self._FLAT_FIELDS:
+            setattr(self, name, None)
         
     def load_explanation(self, explanation: Dict[str, Any]) -> bool:
         """
@@ -29,427 +275,527 @@ class ClinicalChatAgent:
         Returns:
             True if loaded successfully
         """
-        try:
-            self.explanation_data = explanation
-            return True
-        except Exception as e:
-            print(f"Failed to load explanation: {e}")
+        if not isinstance(explanation, dict):
+            print(f"Failed to load explanation: expected dict, got {type(explanation).__name__}")
             return False
+        
+        self.explanation_data = explanation
+        self._flatten_explanation(explanation)
+        self._explanation_version += 1
+        self._answer_cache.clear()
+        return True
+    
+    def _flatten_explanation(self, explanation: Dict[str, Any]):
+        """Extract the fields read by the handlers once, at load time"""
+        decision = explanation.get(_K_DECISION, {}) or {}
+        self._predicted_class = decision.get("predicted_class", "not available")
+        self._confidence = decision.get("confidence", "not available")
+        self._confidence_level = decision.get("confidence_level", "not available")
+        self._reasoning = decision.get("reasoning", "not available")
+        self._is_tumor = decision.get("is_tumor", "not available")
+        
+        uncertainty = explanation.get(_K_UNCERTAINTY, {}) or {}
+        self._uncertainty = uncertainty
+        self._entropy = uncertainty.get("entropy", "not available")
+        self._margin = uncertainty.get("margin", "not available")
+        self._uncertainty_level = uncertainty.get("uncertainty_level", "not available")
+        self._interpretation = uncertainty.get("interpretation", "not available")
+        
+        features = explanation.get(_K_FEATURES, {}) or {}
+        self._grad_cam_available = features.get("grad_cam_available", False)
+        self._grad_cam_description = features.get("grad_cam_description", "not available")
+        self._top_regions = features.get("top_contributing_regions", "not available")
+        self._visual_features = features.get("visual_features", {})
+        
+        self._alternatives = explanation.get(_K_ALTERNATIVES, [])
+        self._all_predictions = explanation.get(_K_ALL_PREDICTIONS, {})
+        # Probability table rendered once, ordered by rank
+        ranked = sorted(self._all_predictions.items(), key=lambda kv: kv[1].get("rank", 999))
+        self._all_preds_block = "".join(
+            f"- {name.capitalize()}: {info.get('probability', 'not available')}% "
+            f"(Rank: {info.get('rank', 'N/A')})\n"
+            for name, info in ranked
+        )
+        
+        quality = explanation.get(_K_QUALITY, {}) or {}
+        self._image_statistics = quality.get("image_statistics", {})
+        self._quality_issues = quality.get("quality_issues", [])
+        self._overall_quality = quality.get("overall_quality", "not available")
+        
+        clinical = explanation.get(_K_CLINICAL, {}) or {}
+        self._recommendation = clinical.get("recommended_action", "not available")
+        self._tumor_types = clinical.get("tumor_types_explanation", {})
+        # General tumor type overview rendered once, marking the predicted class
+        self._tumor_types_block = "".join(
+            f"**{tumor_type.capitalize()}:** {description}"
+            f"{' ← **DETECTED**' if tumor_type == self._predicted_class else ''}\n\n"
+            for tumor_type, description in self._tumor_types.items()
+        )
+        
+        self._timestamp = explanation.get("timestamp", "unknown")
     
-    def answer_question(self, question: str) -> Dict[str, Any]:
+    def answer_question(self, question: str, handler: Optional[str] = None) -> Response:
         """
         Answer doctor's question using only available explanation data
         
         Args:
             question: Doctor's question
+            handler: Optional short handler name (see HANDLER_NAMES) already
+                bound to the question, e.g. for quick questions; skips routing
             
         Returns:
-            Dictionary with answer, sources, and confidence
+            Response with answer, sources, and confidence
         """
         if self.explanation_data is None:
-            return {
-                "answer": "No explanation data loaded. Please run a prediction first.",
-                "sources": [],
-                "grounded": False,
-                "confidence": "N/A"
-            }
+            return _NO_EXPLANATION_RESPONSE
         
         # Normalize question
-        question_lower = question.lower().strip()
+        question_lower = _WS_RE.sub(" ", question.lower()).strip()
         
-        # Store in conversation history
+        # Serve repeated questions from the cache, otherwise route to a handler
+        handler_name = HANDLER_NAMES.get(handler) if handler else None
+        key = self._cache_key(question_lower, handler_name)
+        cached = self._answer_cache.get(key)
+        if cached is not None:
+            response = cached
+        else:
+            tokens = set(_TOKEN_RE.findall(question_lower))
+            if handler_name is not None:
+                response = self._dispatch(handler_name, question_lower, tokens)
+            else:
+                response = self._route_question(question_lower, tokens)
+            self._answer_cache[key] = response
+        
+        # Store in conversation history (summary only, the answer text is not kept)
         self.conversation_history.append({
             "question": question,
-            "timestamp": self.explanation_data.get("timestamp", "unknown")
+            "timestamp": self._timestamp,
+            "response_summary": {
+                "grounded": response.grounded,
+                "confidence": response.confidence,
+                "sources": list(response.sources)
+            }
         })
         
-        # Route to appropriate handler
-        response = self._route_question(question_lower)
-        
-        # Add to conversation history
-        self.conversation_history[-1]["response"] = response
-        
         return response
     
-    def _route_question(self, question: str) -> Dict[str, Any]:
-        """Route question to appropriate handler based on content"""
+    def answer_batch(self, questions: List[str]) -> List[Response]:
+        """
+        Answer many questions against the loaded explanation in one pass
         
-        # Question categories
-        if any(word in question for word in ["what", "which", "diagnosis", "detected", "found", "result"]):
-            return self._handle_diagnosis_question(question)
+        Intended for bulk offline evaluation. Questions are normalized and
+        routed up front, and each distinct answer is built once and shared
+        by every question that routes to it. Batch answers are
+        not recorded in the conversation history.
         
-        elif any(word in question for word in ["confidence", "sure", "certain", "reliable", "accuracy"]):
-            return self._handle_confidence_question(question)
+        Args:
+            questions: Doctor's questions
+            
+        Returns:
+            List of responses, in the same order as questions
+        """
+        if self.explanation_data is None:
+            return [_NO_EXPLANATION_RESPONSE for _ in questions]
         
-        elif any(word in question for word in ["why", "how", "reason", "explain", "cause"]):
-            return self._handle_why_question(question)
+        lowered = [_WS_RE.sub(" ", q.lower()).strip() for q in questions]
+        tokens_per_q = [set(_TOKEN_RE.findall(q)) for q in lowered]
+        handler_per_q = [self._select_handler(q) for q in lowered]
         
-        elif any(word in question for word in ["region", "area", "location", "where", "part"]):
-            return self._handle_location_question(question)
+        # Only the tumor type answer depends on the question itself
+        built = {}
+        responses = []
+        for question, tokens, handler_name in zip(lowered, tokens_per_q, handler_per_q):
+            if handler_name == "_handle_tumor_type_question":
+                key = (handler_name, _specific_tumor_type(tokens))
+            else:
+                key = (handler_name, None)
+            response = built.get(key)
+            if response is None:
+                response = self._dispatch(handler_name, question, tokens)
+                built[key] = response
+            responses.append(response)
         
-        elif any(word in question for word in ["alternative", "other", "differential", "else"]):
-            return self._handle_alternatives_question(question)
+        return responses
+    
+    def answer_question_stream(self, question: str) -> Iterator[str]:
+        """
+        Yield the answer to a question section by section
         
-        elif any(word in question for word in ["quality", "image", "scan", "artifact"]):
-            return self._handle_quality_question(question)
+        Lets callers that only display a prefix stop early without building
+        the full answer. Streamed answers are not cached or recorded in the
+        conversation history.
         
-        elif any(word in question for word in ["recommend", "next", "action", "do", "should"]):
-            return self._handle_recommendation_question(question)
+        Args:
+            question: Doctor's question
+            
+        Yields:
+            Consecutive fragments of the answer text
+        """
+        if self.explanation_data is None:
+            yield "No explanation data loaded. Please run a prediction first."
+            return
         
-        elif any(word in question for word in ["uncertain", "ambiguous", "doubt", "unclear"]):
-            return self._handle_uncertainty_question(question)
+        question_lower = _WS_RE.sub(" ", question.lower()).strip()
         
-        elif any(word in question for word in ["tumor type", "glioma", "meningioma", "pituitary"]):
-            return self._handle_tumor_type_question(question)
+        cached = self._answer_cache.get(self._cache_key(question_lower))
+        if cached is not None:
+            yield cached.answer
+            return
         
+        tokens = set(_TOKEN_RE.findall(question_lower))
+        handler_name = self._select_handler(question_lower)
+        stream_name = self._STREAMS.get(handler_name)
+        if stream_name is not None and self._missing_section(handler_name) is None:
+            yield from getattr(self, stream_name)(question_lower, tokens)
         else:
-            return self._handle_general_question(question)
+            yield self._dispatch(handler_name, question_lower, tokens).answer
     
-    def _handle_diagnosis_question(self, question: str) -> Dict[str, Any]:
+    def _cache_key(self, question: str, handler_name: Optional[str] = None) -> tuple:
+        """Answer cache key for a normalized question (handler_name when pre-bound)"""
+        return (self._explanation_version, question, handler_name)
+    
+    def _select_handler(self, question: str) -> str:
+        """Return the name of the handler for a normalized question"""
+        return route(question)
+    
+    def _route_question(self, question: str, tokens: Set[str]) -> Response:
+        """Route question to appropriate handler based on content"""
+        return self._dispatch(self._select_handler(question), question, tokens)
+    
+    def _missing_section(self, handler_name: str) -> Optional[str]:
+        """Return the handler's required explanation section if it is absent"""
+        section = self._REQUIRED_SECTIONS.get(handler_name)
+        if section is not None and not self.explanation_data.get(section):
+            return section
+        return None
+    
+    def _dispatch(self, handler_name: str, question: str, tokens: Set[str]) -> Response:
+        """Call a handler, skipping it when its required section is missing"""
+        missing = self._missing_section(handler_name)
+        if missing is not None:
+            return self._not_available_response(f"{missing.replace('_', ' ')} missing")
+        return getattr(self, handler_name)(question, tokens)
+    
+    def _handle_diagnosis_question(self, question: str, tokens: Set[str]) -> Response:
         """Handle questions about diagnosis/prediction"""
-        try:
-            decision = self.explanation_data.get("decision_explanation", {})
-            predicted_class = decision.get("predicted_class", "not available")
-            confidence = decision.get("confidence", "not available")
-            is_tumor = decision.get("is_tumor", "not available")
-            
-            if is_tumor:
-                answer = f"The model detected a **{predicted_class}** tumor with {confidence}% confidence. "
-            else:
-                answer = f"The model detected **no tumor** with {confidence}% confidence. "
-            
-            answer += f"\n\n**Clinical Interpretation:** {decision.get('reasoning', 'not available')}"
-            
-            return {
-                "answer": answer,
-                "sources": ["decision_explanation"],
-                "grounded": True,
-                "confidence": "high",
+        predicted_class = self._predicted_class
+        is_tumor = self._is_tumor
+        
+        parts = []
+        if is_tumor:
+            parts.append(f"The model detected a **{predicted_class}** tumor with {self._confidence}% confidence. ")
+        else:
+            parts.append(f"The model detected **no tumor** with {self._confidence}% confidence. ")
+        
+        parts.append(f"\n\n**Clinical Interpretation:** {self._reasoning}")
+        
+        return Response(
+            answer="".join(parts),
+            sources=_SRC_DECISION,
+            sources_str=_SRC_DECISION_STR,
+            grounded=True,
+            confidence="high",
+            extra={
                 "primary_finding": predicted_class,
                 "is_tumor": is_tumor
             }
-        except Exception as e:
-            return self._not_available_response(f"diagnosis information: {e}")
+        )
     
-    def _handle_confidence_question(self, question: str) -> Dict[str, Any]:
+    def _handle_confidence_question(self, question: str, tokens: Set[str]) -> Response:
         """Handle questions about prediction confidence"""
-        try:
-            decision = self.explanation_data.get("decision_explanation", {})
-            uncertainty = self.explanation_data.get("uncertainty_analysis", {})
-            
-            confidence = decision.get("confidence", "not available")
-            confidence_level = decision.get("confidence_level", "not available")
-            uncertainty_level = uncertainty.get("uncertainty_level", "not available")
-            interpretation = uncertainty.get("interpretation", "not available")
-            
-            answer = f"**Confidence Score:** {confidence}%\n\n"
-            answer += f"**Confidence Level:** {confidence_level}\n\n"
-            answer += f"**Uncertainty Assessment:** {uncertainty_level}\n\n"
-            answer += f"**Interpretation:** {interpretation}\n\n"
-            
-            # Add entropy and margin
-            entropy = uncertainty.get("entropy", "not available")
-            margin = uncertainty.get("margin", "not available")
-            answer += f"**Technical Metrics:**\n"
-            answer += f"- Prediction Entropy: {entropy} (lower is more confident)\n"
-            answer += f"- Margin (top 2 classes): {margin} (higher is more confident)"
-            
-            return {
-                "answer": answer,
-                "sources": ["decision_explanation", "uncertainty_analysis"],
-                "grounded": True,
-                "confidence": "high",
+        confidence = self._confidence
+        entropy = self._entropy
+        margin = self._margin
+        
+        answer = build_confidence_answer(
+            confidence,
+            self._confidence_level,
+            self._uncertainty_level,
+            self._interpretation,
+            entropy,
+            margin
+        )
+        
+        return Response(
+            answer=answer,
+            sources=_SRC_CONFIDENCE,
+            sources_str=_SRC_CONFIDENCE_STR,
+            grounded=True,
+            confidence="high",
+            extra={
                 "metrics": {
                     "confidence": confidence,
                     "entropy": entropy,
                     "margin": margin
                 }
             }
-        except Exception as e:
-            return self._not_available_response(f"confidence information: {e}")
+        )
     
-    def _handle_why_question(self, question: str) -> Dict[str, Any]:
+    def _stream_why_answer(self, question: str, tokens: Set[str]) -> Iterator[str]:
+        """Yield the reasoning answer section by section"""
+        visual_features = self._visual_features
+        
+        yield f"**Model Reasoning:** {self._reasoning}\n\n"
+        yield "**Feature Analysis:**\n"
+        
+        if visual_features and isinstance(visual_features, dict):
+            for feature, description in visual_features.items():
+                yield f"- {feature.replace('_', ' ').title()}: {description}\n"
+        
+        yield "\n**Visual Explanation (Grad-CAM):** "
+        if self._grad_cam_available:
+            yield "Available - shows regions most influential in the prediction. "
+            yield f"{self._grad_cam_description}"
+        else:
+            yield "Not available"
+    
+    def _handle_why_question(self, question: str, tokens: Set[str]) -> Response:
         """Handle questions about reasoning/explanation"""
-        try:
-            decision = self.explanation_data.get("decision_explanation", {})
-            features = self.explanation_data.get("feature_contributions", {})
-            
-            reasoning = decision.get("reasoning", "not available")
-            visual_features = features.get("visual_features", {})
-            grad_cam_available = features.get("grad_cam_available", False)
-            
-            answer = f"**Model Reasoning:** {reasoning}\n\n"
-            answer += f"**Feature Analysis:**\n"
-            
-            if visual_features and isinstance(visual_features, dict):
-                for feature, description in visual_features.items():
-                    answer += f"- {feature.replace('_', ' ').title()}: {description}\n"
-            
-            answer += f"\n**Visual Explanation (Grad-CAM):** "
-            if grad_cam_available:
-                answer += f"Available - shows regions most influential in the prediction. "
-                answer += f"{features.get('grad_cam_description', '')}"
-            else:
-                answer += "Not available"
-            
-            return {
-                "answer": answer,
-                "sources": ["decision_explanation", "feature_contributions"],
-                "grounded": True,
-                "confidence": "high",
+        grad_cam_available = self._grad_cam_available
+        
+        return Response(
+            answer="".join(self._stream_why_answer(question, tokens)),
+            sources=_SRC_WHY,
+            sources_str=_SRC_WHY_STR,
+            grounded=True,
+            confidence="high",
+            extra={
                 "grad_cam_available": grad_cam_available
             }
-        except Exception as e:
-            return self._not_available_response(f"reasoning information: {e}")
+        )
     
-    def _handle_location_question(self, question: str) -> Dict[str, Any]:
+    def _handle_location_question(self, question: str, tokens: Set[str]) -> Response:
         """Handle questions about tumor location/regions"""
-        try:
-            features = self.explanation_data.get("feature_contributions", {})
-            grad_cam_available = features.get("grad_cam_available", False)
-            
-            if grad_cam_available:
-                regions = features.get("top_contributing_regions", "not available")
-                grad_cam_desc = features.get("grad_cam_description", "not available")
-                
-                answer = f"**Regional Analysis:**\n\n"
-                answer += f"{regions}\n\n"
-                answer += f"**Grad-CAM Visualization:** {grad_cam_desc}\n\n"
-                answer += f"**Note:** Grad-CAM highlights areas that contributed most to the model's decision. "
-                answer += f"These regions show the highest activation and are most characteristic of the detected pattern."
-            else:
-                answer = "**Regional information not available.** Grad-CAM visualization was not generated for this prediction. "
-                answer += "Spatial localization requires successful Grad-CAM analysis."
-            
-            return {
-                "answer": answer,
-                "sources": ["feature_contributions"],
-                "grounded": True,
-                "confidence": "medium" if grad_cam_available else "low",
+        grad_cam_available = self._grad_cam_available
+        
+        if grad_cam_available:
+            parts = [
+                "**Regional Analysis:**\n\n",
+                f"{self._top_regions}\n\n",
+                f"**Grad-CAM Visualization:** {self._grad_cam_description}\n\n",
+                "**Note:** Grad-CAM highlights areas that contributed most to the model's decision. ",
+                "These regions show the highest activation and are most characteristic of the detected pattern.",
+            ]
+        else:
+            parts = [
+                "**Regional information not available.** Grad-CAM visualization was not generated for this prediction. ",
+                "Spatial localization requires successful Grad-CAM analysis.",
+            ]
+        
+        return Response(
+            answer="".join(parts),
+            sources=_SRC_FEATURES,
+            sources_str=_SRC_FEATURES_STR,
+            grounded=True,
+            confidence="medium" if grad_cam_available else "low",
+            extra={
                 "grad_cam_available": grad_cam_available
             }
-        except Exception as e:
-            return self._not_available_response(f"location information: {e}")
+        )
+    
+    def _stream_alternatives_answer(self, question: str, tokens: Set[str]) -> Iterator[str]:
+        """Yield the differential diagnosis answer section by section"""
+        alternatives = self._alternatives
+        
+        yield "**Differential Diagnosis Considerations:**\n\n"
+        
+        if alternatives and isinstance(alternatives[0], dict) and "note" in alternatives[0]:
+            yield alternatives[0]["note"]
+        elif alternatives:
+            for alt in alternatives:
+                yield (f"- **{alt['class'].capitalize()}**: {alt['probability']}% "
+                       f"({alt['consideration']})\n")
+        else:
+            yield "No significant alternative classes - prediction is highly confident.\n"
+        
+        yield "\n**All Class Probabilities:**\n"
+        yield self._all_preds_block
     
-    def _handle_alternatives_question(self, question: str) -> Dict[str, Any]:
+    def _handle_alternatives_question(self, question: str, tokens: Set[str]) -> Response:
         """Handle questions about alternative diagnoses"""
-        try:
-            alternatives = self.explanation_data.get("alternative_classes", [])
-            all_predictions = self.explanation_data.get("all_predictions", {})
-            
-            answer = "**Differential Diagnosis Considerations:**\n\n"
-            
-            if alternatives and len(alternatives) > 0:
-                if "note" in alternatives[0]:
-                    answer += alternatives[0]["note"]
-                else:
-                    for alt in alternatives:
-                        answer += f"- **{alt['class'].capitalize()}**: {alt['probability']}% "
-                        answer += f"({alt['consideration']})\n"
-            else:
-                answer += "No significant alternative classes - prediction is highly confident.\n"
-            
-            answer += f"\n**All Class Probabilities:**\n"
-            for class_name, info in all_predictions.items():
-                answer += f"- {class_name.capitalize()}: {info['probability']}% (Rank: {info['rank']})\n"
-            
-            return {
-                "answer": answer,
-                "sources": ["alternative_classes", "all_predictions"],
-                "grounded": True,
-                "confidence": "high",
-                "alternatives": alternatives
+        return Response(
+            answer="".join(self._stream_alternatives_answer(question, tokens)),
+            sources=_SRC_ALTERNATIVES,
+            sources_str=_SRC_ALTERNATIVES_STR,
+            grounded=True,
+            confidence="high",
+            extra={
+                "alternatives": self._alternatives
             }
-        except Exception as e:
-            return self._not_available_response(f"alternative diagnosis information: {e}")
+        )
+    
+    def _stream_quality_answer(self, question: str, tokens: Set[str]) -> Iterator[str]:
+        """Yield the image quality answer section by section"""
+        stats = self._image_statistics
+        issues = self._quality_issues
+        
+        yield "**Image Quality Assessment:**\n\n"
+        yield f"**Overall Quality:** {self._overall_quality}\n\n"
+        
+        if issues:
+            yield "**Quality Issues:**\n"
+            for issue in issues:
+                yield f"- {issue}\n"
+            yield "\n"
+        
+        yield "**Image Statistics:**\n"
+        yield f"- Mean Intensity: {stats.get('mean_intensity', 'not available')}\n"
+        yield f"- Standard Deviation: {stats.get('std_intensity', 'not available')}\n"
+        yield f"- Value Range: [{stats.get('min_value', 'N/A')}, {stats.get('max_value', 'N/A')}]\n"
     
-    def _handle_quality_question(self, question: str) -> Dict[str, Any]:
+    def _handle_quality_question(self, question: str, tokens: Set[str]) -> Response:
         """Handle questions about image/data quality"""
-        try:
-            quality = self.explanation_data.get("data_quality", {})
-            
-            stats = quality.get("image_statistics", {})
-            issues = quality.get("quality_issues", [])
-            overall = quality.get("overall_quality", "not available")
-            
-            answer = f"**Image Quality Assessment:**\n\n"
-            answer += f"**Overall Quality:** {overall}\n\n"
-            
-            if issues:
-                answer += f"**Quality Issues:**\n"
-                for issue in issues:
-                    answer += f"- {issue}\n"
-                answer += "\n"
-            
-            answer += f"**Image Statistics:**\n"
-            answer += f"- Mean Intensity: {stats.get('mean_intensity', 'not available')}\n"
-            answer += f"- Standard Deviation: {stats.get('std_intensity', 'not available')}\n"
-            answer += f"- Value Range: [{stats.get('min_value', 'N/A')}, {stats.get('max_value', 'N/A')}]\n"
-            
-            return {
-                "answer": answer,
-                "sources": ["data_quality"],
-                "grounded": True,
-                "confidence": "high",
-                "quality_assessment": overall
+        return Response(
+            answer="".join(self._stream_quality_answer(question, tokens)),
+            sources=_SRC_QUALITY,
+            sources_str=_SRC_QUALITY_STR,
+            grounded=True,
+            confidence="high",
+            extra={
+                "quality_assessment": self._overall_quality
             }
-        except Exception as e:
-            return self._not_available_response(f"quality information: {e}")
+        )
     
-    def _handle_recommendation_question(self, question: str) -> Dict[str, Any]:
+    def _handle_recommendation_question(self, question: str, tokens: Set[str]) -> Response:
         """Handle questions about clinical recommendations"""
-        try:
-            clinical = self.explanation_data.get("clinical_context", {})
-            recommendation = clinical.get("recommended_action", "not available")
-            
-            decision = self.explanation_data.get("decision_explanation", {})
-            predicted_class = decision.get("predicted_class", "not available")
-            confidence = decision.get("confidence", "not available")
-            
-            answer = f"**Clinical Recommendation:**\n\n{recommendation}\n\n"
-            answer += f"**Basis:** Prediction of '{predicted_class}' with {confidence}% confidence.\n\n"
-            answer += f"**Important Note:** This is an AI-assisted diagnostic tool. "
-            answer += f"All findings should be reviewed by a qualified radiologist or clinician "
-            answer += f"before making clinical decisions."
-            
-            return {
-                "answer": answer,
-                "sources": ["clinical_context", "decision_explanation"],
-                "grounded": True,
-                "confidence": "high",
+        recommendation = self._recommendation
+        
+        parts = [
+            f"**Clinical Recommendation:**\n\n{recommendation}\n\n",
+            f"**Basis:** Prediction of '{self._predicted_class}' with {self._confidence}% confidence.\n\n",
+            "**Important Note:** This is an AI-assisted diagnostic tool. "
+            "All findings should be reviewed by a qualified radiologist or clinician "
+            "before making clinical decisions.",
+        ]
+        
+        return Response(
+            answer="".join(parts),
+            sources=_SRC_RECOMMENDATION,
+            sources_str=_SRC_RECOMMENDATION_STR,
+            grounded=True,
+            confidence="high",
+            extra={
                 "recommendation": recommendation
             }
-        except Exception as e:
-            return self._not_available_response(f"recommendation information: {e}")
+        )
     
-    def _handle_uncertainty_question(self, question: str) -> Dict[str, Any]:
+    def _handle_uncertainty_question(self, question: str, tokens: Set[str]) -> Response:
         """Handle questions about uncertainty/ambiguity"""
-        try:
-            uncertainty = self.explanation_data.get("uncertainty_analysis", {})
-            
-            answer = f"**Uncertainty Analysis:**\n\n"
-            answer += f"**Level:** {uncertainty.get('uncertainty_level', 'not available')}\n\n"
-            answer += f"**Interpretation:** {uncertainty.get('interpretation', 'not available')}\n\n"
-            answer += f"**Metrics:**\n"
-            answer += f"- Entropy: {uncertainty.get('entropy', 'not available')} "
-            answer += f"(measures overall prediction uncertainty)\n"
-            answer += f"- Margin: {uncertainty.get('margin', 'not available')} "
-            answer += f"(difference between top 2 predictions)\n\n"
-            answer += f"**Clinical Significance:** Higher entropy and lower margin indicate "
-            answer += f"more ambiguous cases that may benefit from expert review or additional imaging."
-            
-            return {
-                "answer": answer,
-                "sources": ["uncertainty_analysis"],
-                "grounded": True,
-                "confidence": "high",
-                "uncertainty_metrics": uncertainty
+        parts = [
+            "**Uncertainty Analysis:**\n\n",
+            f"**Level:** {self._uncertainty_level}\n\n",
+            f"**Interpretation:** {self._interpretation}\n\n",
+            "**Metrics:**\n",
+            f"- Entropy: {self._entropy} ",
+            "(measures overall prediction uncertainty)\n",
+            f"- Margin: {self._margin} ",
+            "(difference between top 2 predictions)\n\n",
+            "**Clinical Significance:** Higher entropy and lower margin indicate "
+            "more ambiguous cases that may benefit from expert review or additional imaging.",
+        ]
+        
+        return Response(
+            answer="".join(parts),
+            sources=_SRC_UNCERTAINTY,
+            sources_str=_SRC_UNCERTAINTY_STR,
+            grounded=True,
+            confidence="high",
+            extra={
+                "uncertainty_metrics": self._uncertainty
             }
-        except Exception as e:
-            return self._not_available_response(f"uncertainty information: {e}")
+        )
     
-    def _handle_tumor_type_question(self, question: str) -> Dict[str, Any]:
-        """Handle questions about tumor types"""
-        try:
-            clinical = self.explanation_data.get("clinical_context", {})
-            tumor_types = clinical.get("tumor_types_explanation", {})
-            decision = self.explanation_data.get("decision_explanation", {})
-            predicted_class = decision.get("predicted_class", "not available")
-            
-            answer = f"**Tumor Type Information:**\n\n"
-            
-            # Check if asking about specific type or general
-            specific_type = None
-            for tumor_type in ["glioma", "meningioma", "pituitary"]:
-                if tumor_type in question:
-                    specific_type = tumor_type
-                    break
-            
-            if specific_type:
-                answer += f"**{specific_type.capitalize()}:** {tumor_types.get(specific_type, 'not available')}\n\n"
-                if predicted_class == specific_type:
-                    answer += f"This is the **currently predicted** tumor type for this scan.\n"
-                else:
-                    answer += f"The current scan prediction is: **{predicted_class}**\n"
+    def _stream_tumor_type_answer(self, question: str, tokens: Set[str]) -> Iterator[str]:
+        """Yield the tumor type answer section by section"""
+        tumor_types = self._tumor_types
+        predicted_class = self._predicted_class
+        
+        yield "**Tumor Type Information:**\n\n"
+        
+        # Check if asking about specific type or general
+        specific_type = _specific_tumor_type(tokens)
+        
+        if specific_type:
+            yield f"**{specific_type.capitalize()}:** {tumor_types.get(specific_type, 'not available')}\n\n"
+            if predicted_class == specific_type:
+                yield "This is the **currently predicted** tumor type for this scan.\n"
             else:
-                # General tumor type info
-                for tumor_type, description in tumor_types.items():
-                    marker = " ← **DETECTED**" if tumor_type == predicted_class else ""
-                    answer += f"**{tumor_type.capitalize()}:** {description}{marker}\n\n"
-            
-            return {
-                "answer": answer,
-                "sources": ["clinical_context"],
-                "grounded": True,
-                "confidence": "high",
-                "predicted_type": predicted_class
+                yield f"The current scan prediction is: **{predicted_class}**\n"
+        else:
+            # General tumor type info
+            yield self._tumor_types_block
+    
+    def _handle_tumor_type_question(self, question: str, tokens: Set[str]) -> Response:
+        """Handle questions about tumor types"""
+        return Response(
+            answer="".join(self._stream_tumor_type_answer(question, tokens)),
+            sources=_SRC_CLINICAL,
+            sources_str=_SRC_CLINICAL_STR,
+            grounded=True,
+            confidence="high",
+            extra={
+                "predicted_type": self._predicted_class
             }
-        except Exception as e:
-            return self._not_available_response(f"tumor type information: {e}")
+        )
     
-    def _handle_general_question(self, question: str) -> Dict[str, Any]:
+    def _handle_general_question(self, question: str, tokens: Set[str]) -> Response:
         """Handle general questions by searching explanation data"""
-        try:
-            # Try to find relevant information in the explanation
-            answer = "**Based on available model output:**\n\n"
-            
-            # Check decision
-            decision = self.explanation_data.get("decision_explanation", {})
-            answer += f"- Prediction: {decision.get('predicted_class', 'not available')}\n"
-            answer += f"- Confidence: {decision.get('confidence', 'not available')}%\n"
-            answer += f"- Reasoning: {decision.get('reasoning', 'not available')}\n\n"
-            
-            answer += "For more specific information, please ask about:\n"
-            answer += "- Diagnosis/prediction results\n"
-            answer += "- Confidence and uncertainty\n"
-            answer += "- Reasoning and features\n"
-            answer += "- Alternative diagnoses\n"
-            answer += "- Clinical recommendations\n"
-            answer += "- Image quality\n"
-            
-            return {
-                "answer": answer,
-                "sources": ["decision_explanation"],
-                "grounded": True,
-                "confidence": "medium",
+        # Try to find relevant information in the explanation
+        answer = _GENERAL_PREFIX_TMPL.format(
+            pred=self._predicted_class,
+            conf=self._confidence,
+            reason=self._reasoning
+        ) + _GENERAL_SUFFIX
+        
+        return Response(
+            answer=answer,
+            sources=_SRC_DECISION,
+            sources_str=_SRC_DECISION_STR,
+            grounded=True,
+            confidence="medium",
+            extra={
                 "suggestion": "Please ask more specific questions for detailed information"
             }
-        except Exception as e:
-            return self._not_available_response(f"general information: {e}")
+        )
     
-    def _not_available_response(self, context: str) -> Dict[str, Any]:
+    def _not_available_response(self, context: str) -> Response:
         """Return response when information is not available"""
-        return {
-            "answer": f"**This information is not available in the model output.**\n\n"
-                     f"Context: {context}\n\n"
-                     f"The clinical chat agent can only provide information that was "
-                     f"generated during the model's prediction and explanation process. "
-                     f"This specific information was not included in the analysis.",
-            "sources": [],
-            "grounded": False,
-            "confidence": "N/A",
-            "note": "Information not in model output - agent forbidden to hallucinate"
-        }
+        return Response(
+            answer=_NOT_AVAILABLE_TEMPLATE.format(context=context),
+            sources=(),
+            grounded=False,
+            confidence="N/A",
+            extra={
+                "note": "Information not in model output - agent forbidden to hallucinate"
+            }
+        )
     
     def get_conversation_summary(self) -> Dict[str, Any]:
         """Get summary of conversation history"""
         return {
             "total_questions": len(self.conversation_history),
-            "conversation": self.conversation_history,
+            "conversation": list(self.conversation_history),
             "explanation_loaded": self.explanation_data is not None
         }
     
     def clear_conversation(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.conversation_history.clear()
+        self._answer_cache.clear()
     
-    def format_for_display(self, response: Dict[str, Any]) -> str:
+    def format_for_display(self, response) -> str:
         """Format response for display (plain text version)"""
-        output = response["answer"]
-        
-        if response.get("sources"):
-            output += f"\n\n**Data Sources:** {', '.join(response['sources'])}"
-        
-        output += f"\n\n**Grounded in Evidence:** {'Yes' if response['grounded'] else 'No'}"
+        if isinstance(response, Response):
+            answer = response.answer
+            sources = response.sources_str or ", ".join(response.sources)
+            grounded = "Yes" if response.grounded else "No"
+        else:
+            answer = response["answer"]
+            sources = response.get("_sources_str")
+            if sources is None:
+                sources = ", ".join(response.get("sources") or [])
+            grounded = "Yes" if response["grounded"] else "No"
         
-        return output
+        if sources:
+            return _DISPLAY_TMPL.format(answer=answer, sources=sources, grounded=grounded)
+        return _DISPLAY_NO_SOURCES_TMPL.format(answer=answer, grounded=grounded)
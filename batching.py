@@ -0,0 +1,70 @@
+"""
+Request micro-batching for the Brain Tumor Detection System
+Collects concurrent single-image predictions into one batched model call
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Stacks concurrent predict calls into a single forward pass.
+    
+    Each caller submits one [1, H, W, C] array and blocks until its own
+    [1, num_classes] slice of the batched output is ready. A background thread
+    waits at most max_latency seconds after the first request of a batch for
+    more requests, up to max_batch_size.
+    """
+    
+    def __init__(self, predict_fn, max_batch_size: int, max_latency: float):
+        """
+        Initialize the batcher
+        
+        Args:
+            predict_fn: Callable taking a [B, H, W, C] array and returning [B, num_classes]
+            max_batch_size: Maximum number of requests stacked into one call
+            max_latency: Seconds to wait for a batch to fill after its first request
+        """
+        self._predict_fn = predict_fn
+        self._max_batch_size = max_batch_size
+        self._max_latency = max_latency
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+        self._worker.start()
+    
+    def predict(self, img_array: np.ndarray) -> np.ndarray:
+        """Predict a single preprocessed image, batched with concurrent callers"""
+        future = Future()
+        self._requests.put((img_array, future))
+        return future.result()
+    
+    def _collect_batch(self):
+        """Block for one request, then gather more until the batch is full or the deadline passes"""
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self._max_latency
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        """Worker loop: run one forward pass per collected batch"""
+        while True:
+            batch = self._collect_batch()
+            futures = [future for _, future in batch]
+            try:
+                outputs = np.asarray(self._predict_fn(np.concatenate([img for img, _ in batch], axis=0)))
+                for i, future in enumerate(futures):
+                    future.set_result(outputs[i:i + 1])
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
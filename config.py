@@ -2,21 +2,58 @@
 Configuration file for Brain Tumor Detection System
 Modify these settings to customize the application behavior
 """
+import hashlib
+import json
+import sys
+from enum import IntFlag
+from types import MappingProxyType
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to stdlib json
+    orjson = None
 
 # Application Settings
 APP_CONFIG = {
     "debug": True,
     "host": "0.0.0.0",
     "port": 5000,
+    # Hand /uploads/ downloads to the front-end server: None (Flask serves them),
+    # "x-sendfile" (Apache/lighttpd) or "x-accel-redirect" (nginx internal location)
+    "upload_offload": None,
+    "upload_offload_location": "/protected_uploads/",
 }
 
 # Model Settings
 MODEL_CONFIG = {
     "model_path": "models/model.h5",
+    "model_path_fp32": "models/model.h5",  # Always used for Grad-CAM (needs gradients)
+    "model_path_int8": "models/model_int8.tflite",  # Built by scripts/quantize_model.py
+    "runtime": "keras",  # 'keras', 'tflite' (INT8 model) or 'tensorrt' (TF-TRT SavedModel)
+    "model_path_trt": "models/model_trt",  # TF-TRT SavedModel, converted on first startup
+    "trt_precision": "FP16",
+    # Precision of the served model; only meaningful for runtime 'tflite', whose
+    # artifact is INT8. The 'keras' runtime always serves the FP32 model
+    "quantization": None,
+    "calibration_samples": 100,  # Representative images used by scripts/quantize_model.py
+    "model_path_baked": "models/model_baked.keras",  # Built by scripts/bake_preprocessing.py
+    "preprocessing_in_graph": False,  # Resize/normalize inside the baked model
+    "model_path_reduced": "models/model_reduced.h5",  # Cached kito-fused model
+    # Fold BatchNorm into Conv weights with kito (optional dependency, written for
+    # Keras 2). The shipped VGG16 has no BatchNorm layers, so on this architecture
+    # the pass changes nothing; it only helps models that add BatchNorm
+    "fuse_layers": False,
+    "xla_inference": True,  # XLA-compile the Keras forward pass (compiled once per batch size)
     "image_size": 128,
+    "image_decoder": "tf",  # 'tf' (traced tf.io pipeline) or 'cv2' (OpenCV imdecode + resize)
     "class_labels": ['pituitary', 'glioma', 'notumor', 'meningioma'],
 }
 
+# Class labels as an array for vectorized gathers (object dtype keeps plain str)
+CLASS_LABELS = np.array(MODEL_CONFIG["class_labels"], dtype=object)
+
 # Explainability Agent Settings
 EXPLAINABILITY_CONFIG = {
     "confidence_threshold": 0.7,  # Threshold for high confidence
@@ -27,6 +64,10 @@ EXPLAINABILITY_CONFIG = {
     "include_clinical_context": True,
     "export_explanations": False,  # Auto-export to JSON files
     "export_directory": "explanations/",
+    "export_format": "json.zst",  # 'json' or 'json.zst' (orjson + zstd)
+    "export_compression_level": 3,
+    "background_explanations": False,  # Show the diagnosis first, explain on a worker thread
+    "background_workers": 2,
 }
 
 # Clinical Chat Agent Settings
@@ -34,14 +75,37 @@ CHAT_CONFIG = {
     "max_conversation_history": 50,  # Maximum questions to store
     "enable_quick_questions": True,
     "default_response_format": "markdown",  # 'markdown' or 'plain'
+    # Question routing table: (keyword, handler) pairs in priority order.
+    # Keywords match as word prefixes and the earliest matching route wins
+    "keyword_routes": tuple(
+        (keyword, handler)
+        for handler, keywords in (
+            ("diagnosis", ("what", "which", "diagnosis", "detected", "diagnosed", "found", "result", "results")),
+            ("confidence", ("confidence", "confident", "sure", "certain", "reliable", "accuracy", "accurate")),
+            ("why", ("why", "how", "reason", "reasons", "explain", "explanation", "cause")),
+            ("location", ("region", "regions", "area", "areas", "location", "located", "where", "part")),
+            ("alternatives", ("alternative", "alternatives", "other", "another", "differential", "else")),
+            ("quality", ("quality", "image", "scan", "artifact", "artifacts")),
+            ("recommendation", ("recommend", "recommendation", "recommendations", "recommended",
+                                "next", "action", "do", "should")),
+            ("uncertainty", ("uncertain", "uncertainty", "ambiguous", "doubt", "unclear")),
+            ("tumor_type", ("tumor type", "glioma", "meningioma", "pituitary")),
+        )
+        for keyword in keywords
+    ),
 }
 
 # Upload Settings
 UPLOAD_CONFIG = {
     "upload_folder": "./uploads",
     "max_file_size": 16 * 1024 * 1024,  # 16MB
-    "allowed_extensions": {'.jpg', '.jpeg', '.png', '.gif', '.bmp'},
+    # Normalized (lowercase, leading-dot) extensions; check with
+    # os.path.splitext(name)[1].lower() in UPLOAD_CONFIG["allowed_extensions"]
+    "allowed_extensions": frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp'}),
 }
+UPLOAD_CONFIG["allowed_extensions_nodot"] = frozenset(
+    ext.lstrip('.') for ext in UPLOAD_CONFIG["allowed_extensions"]
+)
 
 # UI Settings
 UI_CONFIG = {
@@ -73,6 +137,23 @@ LOGGING_CONFIG = {
     "log_level": "INFO",  # DEBUG, INFO, WARNING, ERROR, CRITICAL
 }
 
+class LogChannel(IntFlag):
+    """Loggable event channels, combined into a single bitmask"""
+    PREDICTIONS = 1
+    EXPLANATIONS = 2
+    CHAT = 4
+
+# Enabled channels, fixed at import; treat LOGGING_CONFIG as read-only at runtime
+_LOG_MASK = (
+    (LogChannel.PREDICTIONS if LOGGING_CONFIG["log_predictions"] else 0)
+    | (LogChannel.EXPLANATIONS if LOGGING_CONFIG["log_explanations"] else 0)
+    | (LogChannel.CHAT if LOGGING_CONFIG["log_chat_conversations"] else 0)
+)
+
+def should_log(channel):
+    """Return True if events on the given channel should be logged"""
+    return bool(_LOG_MASK & channel)
+
 # Security Settings
 SECURITY_CONFIG = {
     "sanitize_filenames": True,
@@ -83,8 +164,22 @@ SECURITY_CONFIG = {
 # Advanced Settings
 ADVANCED_CONFIG = {
     "cache_explanations": True,  # Cache explanations to avoid regeneration
-    "cache_timeout": 3600,  # Cache timeout in seconds (1 hour)
+    # Explanations are keyed on image content + model version; the model is
+    # deterministic, so entries never expire and are only evicted by size
+    "cache_backend": "memory",  # In-process LRU
+    "cache_key_algo": "blake2b",
+    "cache_model_version": "vgg16-v1",
+    "cache_max_entries": 128,
     "async_processing": False,  # Enable async for large batches
+    "async_workers": 1,  # Background prediction workers (one model instance is shared)
+    "max_sessions": 256,  # Per-upload chat sessions kept in memory, evicted oldest-first
+}
+
+# Request Micro-batching Settings
+BATCHING_CONFIG = {
+    "enabled": True,  # Stack concurrent uploads into one model forward pass
+    "max_batch_size": SECURITY_CONFIG["max_concurrent_uploads"],
+    "max_latency_ms": 20,  # Max wait for a batch to fill after its first request
 }
 
 # Clinical Recommendations Templates
@@ -154,12 +249,92 @@ UNCERTAINTY_THRESHOLDS = {
     "margin_moderate": 0.3
 }
 
+# Sorted threshold arrays for bucketizing with np.searchsorted. Scalars and
+# arrays are both accepted, so a whole batch is classified in one call
+_CONF_ORDER = sorted(CONFIDENCE_THRESHOLDS, key=CONFIDENCE_THRESHOLDS.get)
+_CONF_THRESH = np.array([CONFIDENCE_THRESHOLDS[level] for level in _CONF_ORDER])
+_CONF_LABELS = np.array([level.replace("_", " ") for level in _CONF_ORDER])
+_ENTROPY_BOUNDS = np.array([
+    UNCERTAINTY_THRESHOLDS["entropy_low"],
+    UNCERTAINTY_THRESHOLDS["entropy_moderate"],
+])
+# Margins are "higher is better", so they are bucketized negated
+_NEG_MARGIN_BOUNDS = -np.array([
+    UNCERTAINTY_THRESHOLDS["margin_high"],
+    UNCERTAINTY_THRESHOLDS["margin_moderate"],
+])
+
+def confidence_level(confidence):
+    """
+    Map confidence (0-1, scalar or array) to 'low', 'moderate', 'high' or 'very high'
+    
+    Negative and non-finite (NaN, inf) confidences are reported as 'low'.
+    """
+    idx = np.clip(np.searchsorted(_CONF_THRESH, confidence, side="right") - 1, 0, None)
+    labels = _CONF_LABELS[np.where(np.isfinite(confidence), idx, 0)]
+    return str(labels) if np.ndim(labels) == 0 else labels
+
+def uncertainty_band(entropy, margin):
+    """
+    Map entropy and top-2 margin to an uncertainty band: 0 low, 1 moderate, 2 high
+    
+    A prediction is only as certain as its weaker metric, so the band is the
+    worse of the entropy band and the margin band.
+    """
+    entropy_band = np.searchsorted(_ENTROPY_BOUNDS, entropy, side="right")
+    margin_band = np.searchsorted(_NEG_MARGIN_BOUNDS, np.negative(margin), side="right")
+    band = np.maximum(entropy_band, margin_band)
+    return int(band) if np.ndim(band) == 0 else band
+
+# Confidence level -> recommendation band ("high", "moderate" or "low")
+_RECOMMENDATION_BANDS = {
+    "very high": "high",
+    "high": "moderate",
+    "moderate": "low",
+    "low": "low",
+}
+
+def _render_recommendation(tumor_type, band):
+    """Format the recommendation template for one tumor type and band"""
+    if tumor_type == "notumor":
+        # No-tumor guidance has only two bands; anything below high is moderate
+        key = "high_confidence_no_tumor" if band == "high" else "moderate_confidence_no_tumor"
+        return CLINICAL_RECOMMENDATIONS[key]
+    template = CLINICAL_RECOMMENDATIONS[f"{band}_confidence_tumor"]
+    # Capitalize the tumor type when it starts the sentence
+    name = tumor_type.capitalize() if template.startswith("{tumor_type}") else tumor_type
+    return template.format(tumor_type=name)
+
+# Every (tumor type, band) recommendation, rendered once at import
+_RECOMMENDATIONS = {
+    (tumor_type, band): _render_recommendation(tumor_type, band)
+    for tumor_type in MODEL_CONFIG["class_labels"]
+    for band in ("high", "moderate", "low")
+}
+
+def recommendation_band(confidence):
+    """Map a confidence score (0-1) to its recommendation band"""
+    return _RECOMMENDATION_BANDS[confidence_level(confidence)]
+
+def recommendation(tumor_type, band):
+    """Return the pre-rendered clinical recommendation for a tumor type and band"""
+    text = _RECOMMENDATIONS.get((tumor_type, band))
+    return text if text is not None else _render_recommendation(tumor_type, band)
+
 # Grad-CAM Settings
 GRADCAM_CONFIG = {
     "enabled": True,
     "save_heatmaps": False,
     "heatmap_directory": "gradcam_outputs/",
     "colormap": "jet",  # OpenCV colormap
+    # One gradient model and compiled Grad-CAM function are built when the
+    # agent starts and reused by every request (no per-request model/tape state)
+    "reuse_instance": True,
+    # Take predictions from the Grad-CAM forward pass instead of running the backbone twice.
+    # Trade-off: that pass is per-image, so while it is active (Keras runtime, synchronous
+    # explanations) uploads are not micro-batched (BATCHING_CONFIG is ignored). Set False
+    # to batch concurrent predictions and run Grad-CAM as a separate pass
+    "share_forward_pass": True,
 }
 
 # Export Settings
@@ -169,32 +344,53 @@ EXPORT_CONFIG = {
     "include_visualizations": True,
 }
 
+def explanation_cache_key(image_bytes):
+    """Content-addressed cache key for an uploaded image under the current model version"""
+    digest = hashlib.new(ADVANCED_CONFIG["cache_key_algo"], image_bytes).hexdigest()
+    return f"{ADVANCED_CONFIG['cache_model_version']}:{digest}"
+
+# Aggregated configuration, built once at import time. The settings never
+# change at runtime, so the read-only view and its JSON rendering are shared
+_CONFIG = MappingProxyType({
+    "app": APP_CONFIG,
+    "model": MODEL_CONFIG,
+    "explainability": EXPLAINABILITY_CONFIG,
+    "chat": CHAT_CONFIG,
+    "upload": UPLOAD_CONFIG,
+    "ui": UI_CONFIG,
+    "api": API_CONFIG,
+    "logging": LOGGING_CONFIG,
+    "security": SECURITY_CONFIG,
+    "advanced": ADVANCED_CONFIG,
+    "batching": BATCHING_CONFIG,
+    "clinical_recommendations": CLINICAL_RECOMMENDATIONS,
+    "tumor_types": TUMOR_TYPES_INFO,
+    "confidence_thresholds": CONFIDENCE_THRESHOLDS,
+    "uncertainty_thresholds": UNCERTAINTY_THRESHOLDS,
+    "gradcam": GRADCAM_CONFIG,
+    "export": EXPORT_CONFIG,
+})
+# Sets (allowed extensions) are emitted as sorted lists
+if orjson is not None:
+    _CONFIG_JSON = orjson.dumps(
+        dict(_CONFIG), default=sorted, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE
+    )
+else:
+    _CONFIG_JSON = (json.dumps(dict(_CONFIG), indent=2, default=sorted) + "\n").encode()
+
 def get_config():
-    """Return all configuration as a single dictionary"""
-    return {
-        "app": APP_CONFIG,
-        "model": MODEL_CONFIG,
-        "explainability": EXPLAINABILITY_CONFIG,
-        "chat": CHAT_CONFIG,
-        "upload": UPLOAD_CONFIG,
-        "ui": UI_CONFIG,
-        "api": API_CONFIG,
-        "logging": LOGGING_CONFIG,
-        "security": SECURITY_CONFIG,
-        "advanced": ADVANCED_CONFIG,
-        "clinical_recommendations": CLINICAL_RECOMMENDATIONS,
-        "tumor_types": TUMOR_TYPES_INFO,
-        "confidence_thresholds": CONFIDENCE_THRESHOLDS,
-        "uncertainty_thresholds": UNCERTAINTY_THRESHOLDS,
-        "gradcam": GRADCAM_CONFIG,
-        "export": EXPORT_CONFIG,
-    }
+    """Return all configuration as a single read-only mapping"""
+    return _CONFIG
 
 def print_config():
     """Print all configuration settings"""
-    import json
-    config = get_config()
-    print(json.dumps(config, indent=2))
+    stream = getattr(sys.stdout, "buffer", None)
+    if stream is not None:
+        sys.stdout.flush()
+        stream.write(_CONFIG_JSON)
+        stream.flush()
+    else:
+        sys.stdout.write(_CONFIG_JSON.decode())
 
 if __name__ == "__main__":
     print_config()
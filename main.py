@@ -1,16 +1,36 @@
-from flask import Flask, render_template, request, send_from_directory, jsonify
+from flask import Flask, Response, abort, render_template, request, send_from_directory, jsonify
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.security import safe_join
 from keras.models import load_model
-from keras.preprocessing.image import load_img, img_to_array
 
 import numpy as np
+import tensorflow as tf
 import os
+import hashlib
 import json
+import logging
+import shutil
 import sys
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 
+from batching import MicroBatcher
+from config import (
+    ADVANCED_CONFIG, APP_CONFIG, BATCHING_CONFIG, EXPLAINABILITY_CONFIG, GRADCAM_CONFIG, LOGGING_CONFIG, MODEL_CONFIG,
+    UI_CONFIG, UPLOAD_CONFIG,
+    LogChannel, explanation_cache_key, should_log
+)
+
 # Import agents
 from agents.explainability_agent import ExplainabilityAgent
-from agents.clinical_chat_agent import ClinicalChatAgent
+from agents.clinical_chat_agent import ClinicalChatAgent, route_name
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to Flask's stdlib json provider
+    orjson = None
 
 def check_prerequisites():
     """Check if all required files and directories exist before starting"""
@@ -20,6 +40,19 @@ def check_prerequisites():
     
     checks_passed = True
     
+    # One scandir per parent directory: name -> is_dir, instead of a stat per path
+    listings = {}
+    def lookup(path):
+        parent, name = os.path.split(os.path.normpath(path))
+        parent = parent or '.'
+        if parent not in listings:
+            try:
+                with os.scandir(parent) as entries:
+                    listings[parent] = {entry.name: entry.is_dir() for entry in entries}
+            except OSError:
+                listings[parent] = {}
+        return listings[parent].get(name)
+    
     print("\n[1] Checking required files...")
     required_files = [
         ('models/model.h5', 'Trained model'),
@@ -29,7 +62,7 @@ def check_prerequisites():
     ]
     
     for filepath, description in required_files:
-        if os.path.exists(filepath):
+        if lookup(filepath) is not None:
             print(f"  ✓ {description} found")
         else:
             print(f"  ✗ {description} NOT FOUND: {filepath}")
@@ -44,7 +77,7 @@ def check_prerequisites():
     ]
     
     for dirpath, description in required_dirs:
-        if os.path.exists(dirpath) and os.path.isdir(dirpath):
+        if lookup(dirpath):
             print(f"  ✓ {description} found")
         else:
             print(f"  ✗ {description} NOT FOUND: {dirpath}")
@@ -66,13 +99,133 @@ def check_prerequisites():
 # Run prerequisite checks
 check_prerequisites()
 
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    jsonify() backed by orjson: numpy scalars/arrays serialize natively and
+    responses are built from bytes. Keys stay sorted like the default provider.
+    """
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS if orjson else 0
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self._OPTIONS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        payload = orjson.dumps(obj, default=self.default, option=self._OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(payload, mimetype=self.mimetype)
+
 # Initialize Flask app
 app = Flask(__name__)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
+# Application event log (predictions, explanations, chat), kept out of the console
+logger = logging.getLogger("brain_tumor_detection")
+logger.setLevel(LOGGING_CONFIG["log_level"])
+logger.propagate = False
+_log_handler = logging.FileHandler(LOGGING_CONFIG["log_file"])
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+logger.addHandler(_log_handler)
 
-# Load the trained model
+# Grow GPU memory on demand instead of reserving all of it, so several workers can share a card
+gpus = tf.config.list_physical_devices('GPU')
+for gpu in gpus:
+    tf.config.experimental.set_memory_growth(gpu, True)
+
+# Load the trained model, pinning its weights to the device that runs inference
 print("Loading VGG16 model...")
-model = load_model('models/model.h5')
-print("✓ Model loaded successfully")
+with tf.device('/GPU:0' if gpus else '/CPU:0'):
+    if MODEL_CONFIG["fuse_layers"] and os.path.exists(MODEL_CONFIG["model_path_reduced"]):
+        model = load_model(MODEL_CONFIG["model_path_reduced"])
+        print("✓ Fused model loaded successfully")
+    else:
+        model = load_model('models/model.h5')
+        print("✓ Model loaded successfully")
+        if MODEL_CONFIG["fuse_layers"]:
+            # Fuse once and cache, so later startups skip the pass. kito targets
+            # Keras 2, so any failure keeps the unfused model, like the TensorRT path
+            try:
+                from kito import reduce_keras_model
+                fused_model = reduce_keras_model(model)
+                fused_model.save(MODEL_CONFIG["model_path_reduced"])
+                model = fused_model
+                print("✓ Model layers fused with kito")
+            except ImportError:
+                print("⚠ kito not installed, serving the unfused model")
+            except Exception as e:
+                print(f"⚠ kito fusion failed, serving the unfused model: {e}")
+
+    # Model with resize + normalization baked into its graph, when configured
+    baked_model = None
+    if MODEL_CONFIG["preprocessing_in_graph"] and os.path.exists(MODEL_CONFIG["model_path_baked"]):
+        baked_model = load_model(MODEL_CONFIG["model_path_baked"])
+        print("✓ Baked preprocessing model loaded")
+
+# Serve predictions from the INT8 TFLite model when configured; Grad-CAM keeps the FP32 model
+prediction_model = model
+if MODEL_CONFIG["runtime"] == "tflite" and os.path.exists(MODEL_CONFIG["model_path_int8"]):
+    from quantized_model import TFLiteClassifier
+    prediction_model = TFLiteClassifier(MODEL_CONFIG["model_path_int8"])
+    print("✓ Quantized INT8 model loaded for predictions")
+elif MODEL_CONFIG["runtime"] == "tensorrt":
+    # Convert once and reuse the SavedModel; keep the .h5 model if TensorRT is unavailable
+    from quantized_model import TensorRTClassifier, convert_to_tensorrt
+    try:
+        if not os.path.isdir(MODEL_CONFIG["model_path_trt"]):
+            print("Converting model with TF-TRT (one-time)...")
+            convert_to_tensorrt(model, MODEL_CONFIG["model_path_trt"], MODEL_CONFIG["trt_precision"])
+        prediction_model = TensorRTClassifier(MODEL_CONFIG["model_path_trt"])
+        print(f"✓ TensorRT {MODEL_CONFIG['trt_precision']} model loaded for predictions")
+    except Exception as e:
+        print(f"⚠ TensorRT unavailable, using Keras model: {e}")
+
+# Largest batch any forward pass sees: the micro-batcher never exceeds it and
+# /api/predict_batch splits larger uploads into chunks of this size
+MAX_FORWARD_BATCH = BATCHING_CONFIG["max_batch_size"]
+WARMUP_BATCH_SIZES = range(1, MAX_FORWARD_BATCH + 1)
+
+if prediction_model is model:
+    # Call the Keras model in a traced graph; predict() adds a per-call loop (tf.data, callbacks)
+    @tf.function(
+        input_signature=[tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32)],
+        jit_compile=MODEL_CONFIG["xla_inference"]
+    )
+    def _forward(x):
+        return model(x, training=False)
+    
+    def predict_fn(img_array):
+        return _forward(tf.constant(img_array, dtype=tf.float32)).numpy()
+    
+    # Trace (and XLA-compile) now so the first requests don't pay for it. XLA
+    # compiles per batch size, and every caller stays within MAX_FORWARD_BATCH
+    # (with the shared Grad-CAM pass on, only /api/predict_batch calls it)
+    print("Warming up the model...")
+    for batch_size in WARMUP_BATCH_SIZES:
+        predict_fn(np.zeros((batch_size,) + tuple(model.input_shape[1:]), dtype=np.float32))
+    print("✓ Model warmed up")
+else:
+    predict_fn = prediction_model.predict
+
+# Synchronous uploads take their predictions from the per-image Grad-CAM pass,
+# one backbone pass per request; the micro-batcher would never see them then
+SHARED_FORWARD_PASS = (
+    prediction_model is model and baked_model is None
+    and GRADCAM_CONFIG["enabled"] and GRADCAM_CONFIG["share_forward_pass"]
+    and not EXPLAINABILITY_CONFIG["background_explanations"]
+)
+
+# Batch concurrent predictions into a single forward pass
+prediction_batcher = (
+    MicroBatcher(
+        predict_fn,
+        max_batch_size=BATCHING_CONFIG["max_batch_size"],
+        max_latency=BATCHING_CONFIG["max_latency_ms"] / 1000
+    )
+    if BATCHING_CONFIG["enabled"] and not SHARED_FORWARD_PASS else None
+)
 
 # Class labels
 class_labels = ['pituitary', 'glioma', 'notumor', 'meningioma']
@@ -80,11 +233,82 @@ class_labels = ['pituitary', 'glioma', 'notumor', 'meningioma']
 # Initialize agents
 print("Initializing AI agents...")
 explainability_agent = ExplainabilityAgent(model, class_labels)
-clinical_chat_agent = ClinicalChatAgent()
+# Compile Grad-CAM for every chunk size /api/predict_batch can produce, and the
+# shared predict + Grad-CAM pass when uploads use it
+explainability_agent.warm_up(WARMUP_BATCH_SIZES, shared_pass=SHARED_FORWARD_PASS)
 print("✓ Agents initialized successfully\n")
 
-# Store current explanation globally (for chat context)
-current_explanation = None
+# Quick questions with their handlers pre-bound, serialized once and served with an ETag
+QUICK_QUESTIONS = {
+    question: route_name(" ".join(question.lower().split()))
+    for question in UI_CONFIG["quick_questions"]
+}
+QUICK_QUESTIONS_BYTES = json.dumps(QUICK_QUESTIONS).encode()
+QUICK_QUESTIONS_ETAG = hashlib.blake2b(QUICK_QUESTIONS_BYTES, digest_size=16).hexdigest()
+
+# Chat sessions by sid, one per prediction: each holds its own ClinicalChatAgent
+# (which keeps the explanation), so concurrent requests never share chat state.
+# The store is per process; serve with threads, or pin clients to one worker process.
+chat_sessions = {}
+chat_sessions_lock = threading.Lock()
+
+# Explanations still being generated in the background, by sid
+pending_explanations = {}
+
+def create_session(explanation):
+    """
+    Start a chat session grounded in an explanation and return its sid.
+    explanation may be a Future; it is loaded on first access once finished.
+    """
+    agent = ClinicalChatAgent()
+    sid = uuid.uuid4().hex
+    with chat_sessions_lock:
+        if len(chat_sessions) >= ADVANCED_CONFIG["max_sessions"]:
+            evicted = next(iter(chat_sessions))
+            del chat_sessions[evicted]
+            pending_explanations.pop(evicted, None)
+        if isinstance(explanation, Future):
+            pending_explanations[sid] = explanation
+        else:
+            agent.load_explanation(explanation)
+        chat_sessions[sid] = agent
+    return sid
+
+def get_session(sid):
+    """Return (agent, status) for a sid; status is "ready", "processing" or "failed" and agent is None for unknown sessions"""
+    agent = chat_sessions.get(sid)
+    future = pending_explanations.get(sid)
+    if agent is None or future is None:
+        return agent, "ready"
+    if not future.done():
+        return agent, "processing"
+    if future.exception() is not None:
+        # Keep the failed future so every later request reports the same error
+        return agent, "failed"
+    with chat_sessions_lock:
+        if sid in pending_explanations:
+            agent.load_explanation(future.result())
+            del pending_explanations[sid]
+    return agent, "ready"
+
+def pending_session_response():
+    return jsonify({
+        "error": "The explanation is still being generated. Please try again shortly.",
+        "status": "processing"
+    }), 202
+
+def failed_session_response(sid):
+    future = pending_explanations.get(sid)
+    return jsonify({
+        "error": f"Explanation failed: {future.exception() if future else 'session expired'}",
+        "status": "failed"
+    }), 500
+
+def no_session_response():
+    return jsonify({
+        "error": "No prediction available. Please upload an image first.",
+        "status": "no_data"
+    }), 404
 
 # Define the uploads folder
 UPLOAD_FOLDER = './uploads'
@@ -92,25 +316,96 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# send_from_directory emits an X-Sendfile header instead of streaming the bytes
+app.use_x_sendfile = APP_CONFIG["upload_offload"] == "x-sendfile"
+# Larger requests are rejected with 413 before the body is read
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_CONFIG["max_file_size"]
 
-# Helper function to predict tumor type with explanation
-def predict_tumor_with_explanation(image_path):
-    global current_explanation
-    
-    IMAGE_SIZE = 128
-    img = load_img(image_path, target_size=(IMAGE_SIZE, IMAGE_SIZE))
-    img_array = img_to_array(img) / 255.0  # Normalize pixel values
-    img_array = np.expand_dims(img_array, axis=0)  # Add batch dimension
+# Uploads below this size are kept in memory and decoded without reading the file back
+SMALL_UPLOAD_BYTES = 512 * 1024
+
+def save_upload(file):
+    """
+    Write an upload to the uploads folder in 1MB chunks and return (path, bytes).
+    bytes is the in-memory payload for small uploads and None otherwise.
+    """
+    file_location = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
+    if request.content_length is not None and request.content_length < SMALL_UPLOAD_BYTES:
+        image_bytes = file.stream.read()
+        with open(file_location, 'wb') as f:
+            f.write(image_bytes)
+        return file_location, image_bytes
+    with open(file_location, 'wb') as f:
+        shutil.copyfileobj(file.stream, f, length=1 << 20)
+    return file_location, None
+
+if EXPLAINABILITY_CONFIG["export_explanations"]:
+    os.makedirs(EXPLAINABILITY_CONFIG["export_directory"], exist_ok=True)
+
+# Background prediction queue, enabled by ADVANCED_CONFIG["async_processing"]
+prediction_executor = (
+    ThreadPoolExecutor(max_workers=ADVANCED_CONFIG["async_workers"])
+    if ADVANCED_CONFIG["async_processing"] else None
+)
+prediction_tasks = {}
+
+# Explanations generated after the diagnosis is returned, enabled by
+# EXPLAINABILITY_CONFIG["background_explanations"]
+explanation_executor = (
+    ThreadPoolExecutor(max_workers=EXPLAINABILITY_CONFIG["background_workers"])
+    if EXPLAINABILITY_CONFIG["background_explanations"] else None
+)
+
+# (result, confidence, explanation) by image content hash, evicted oldest-first
+prediction_cache = {}
+prediction_cache_lock = threading.Lock()
+
+IMAGE_SIZE = MODEL_CONFIG["image_size"]
+
+@tf.function(input_signature=[tf.TensorSpec([], tf.string)])
+def decode_image(contents):
+    """Decode encoded image bytes to a uint8 [1, H, W, 3] batch"""
+    return tf.expand_dims(tf.io.decode_image(contents, channels=3, expand_animations=False), 0)
+
+@tf.function(input_signature=[tf.TensorSpec([], tf.string)])
+def preprocess_image(contents):
+    """Decode, resize and normalize encoded image bytes in one traced graph"""
+    img = decode_image(contents)
+    # Nearest-neighbour matches keras load_img's default interpolation
+    img = tf.image.resize(img, [IMAGE_SIZE, IMAGE_SIZE], method="nearest")
+    return tf.cast(img, tf.float32) / 255.0
+
+if MODEL_CONFIG["image_decoder"] == "cv2":
+    import cv2
 
-    predictions = model.predict(img_array)
-    predicted_class_index = np.argmax(predictions, axis=1)[0]
-    confidence_score = np.max(predictions, axis=1)[0]
+# Where preprocessing runs, recorded in the explanation's preprocessing logs
+PREPROCESSING_LOCATION = "opencv" if MODEL_CONFIG["image_decoder"] == "cv2" else "tf.function"
 
-    # Generate explanation using ExplainabilityAgent
+def load_pixels(image_bytes):
+    """Decode, resize and normalize encoded image bytes to a float32 [1, H, W, 3] array"""
+    if MODEL_CONFIG["image_decoder"] != "cv2":
+        return preprocess_image(tf.constant(image_bytes)).numpy()
+    img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Unsupported or corrupt image")
+    # Nearest-neighbour as in the tf pipeline; swap BGR -> RGB after shrinking
+    img = cv2.resize(img, (IMAGE_SIZE, IMAGE_SIZE), interpolation=cv2.INTER_NEAREST)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return (img.astype(np.float32) / 255.0)[np.newaxis]
+
+def diagnosis_label(predicted_class):
+    """Result text shown for a predicted class"""
+    if predicted_class == 'notumor':
+        return "No Tumor"
+    return f"Tumor: {predicted_class}"
+
+def explain_prediction(image_path, img_array, predictions, grad_cam_data, result, confidence_score, cache_key):
+    """Build, log, export and cache the explanation for a finished prediction"""
     preprocessing_logs = {
         "resize": "128x128",
         "normalization": "pixel values / 255.0",
         "color_space": "RGB",
+        "location": "model graph" if baked_model is not None else PREPROCESSING_LOCATION,
         "timestamp": datetime.now().isoformat()
     }
     
@@ -126,19 +421,93 @@ def predict_tumor_with_explanation(image_path):
         img_array=img_array,
         predictions=predictions,
         preprocessing_logs=preprocessing_logs,
-        metadata=metadata
+        metadata=metadata,
+        grad_cam=grad_cam_data
     )
     
-    # Store explanation for chat agent
-    current_explanation = explanation
-    clinical_chat_agent.load_explanation(explanation)
+    if should_log(LogChannel.EXPLANATIONS) and logger.isEnabledFor(logging.INFO):
+        logger.info("explanation %s: %s", os.path.basename(image_path),
+                    explanation.get("status", "completed"))
+    
+    # Auto-export the explanation when enabled
+    if EXPLAINABILITY_CONFIG["export_explanations"]:
+        export_format = EXPLAINABILITY_CONFIG["export_format"]
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        export_path = os.path.join(
+            EXPLAINABILITY_CONFIG["export_directory"],
+            f"{stem}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}.{export_format}"
+        )
+        if export_format == "json.zst":
+            explainability_agent.export_compressed(
+                explanation, export_path, EXPLAINABILITY_CONFIG["export_compression_level"]
+            )
+        else:
+            explainability_agent.export_to_json(explanation, export_path)
+    
+    if cache_key is not None:
+        with prediction_cache_lock:
+            if len(prediction_cache) >= ADVANCED_CONFIG["cache_max_entries"]:
+                del prediction_cache[next(iter(prediction_cache))]
+            prediction_cache[cache_key] = (result, confidence_score, explanation)
+    
+    return explanation
 
-    if class_labels[predicted_class_index] == 'notumor':
-        result = "No Tumor"
+# Helper function to predict tumor type with explanation
+def predict_tumor_with_explanation(image_path, image_bytes=None, background=False):
+    """
+    Predict an image and explain it; returns (result, confidence, explanation).
+    With background=True the explanation is a Future run on explanation_executor,
+    so the caller can show the diagnosis before the explanation is ready.
+    """
+    # Small uploads arrive in memory; anything else is read from disk once
+    if image_bytes is None:
+        with open(image_path, "rb") as f:
+            image_bytes = f.read()
+    
+    # Re-uploads of the same scan skip preprocessing, inference and explanation
+    cache_key = None
+    if ADVANCED_CONFIG["cache_explanations"]:
+        cache_key = explanation_cache_key(image_bytes)
+        with prediction_cache_lock:
+            cached = prediction_cache.get(cache_key)
+        if cached is not None:
+            if background:
+                done = Future()
+                done.set_result(cached[2])
+                return cached[0], cached[1], done
+            return cached
+    
+    grad_cam_data = None
+    if baked_model is not None:
+        # Resize and normalization run inside the model on the raw decoded pixels
+        raw = decode_image(tf.constant(image_bytes)).numpy()
+        img_array, predictions = (t.numpy() for t in baked_model(raw, training=False))
     else:
-        result = f"Tumor: {class_labels[predicted_class_index]}"
+        img_array = load_pixels(image_bytes)
+
+        # When the Keras model serves predictions, one Grad-CAM pass yields both;
+        # a background explanation runs Grad-CAM later, so predict with the plain forward pass
+        shared = None
+        if SHARED_FORWARD_PASS and not background:
+            shared = explainability_agent.predict_with_grad_cam(img_array)
+        if shared is not None:
+            predictions, grad_cam_data = shared
+        elif prediction_batcher is not None:
+            predictions = prediction_batcher.predict(img_array)
+        else:
+            predictions = predict_fn(img_array)
+    probs = predictions[0]
+    predicted_class_index = int(probs.argmax())
+    confidence_score = float(probs[predicted_class_index])
+    if should_log(LogChannel.PREDICTIONS) and logger.isEnabledFor(logging.INFO):
+        logger.info("prediction %s: %s (%.4f)", os.path.basename(image_path),
+                    class_labels[predicted_class_index], confidence_score)
     
-    return result, confidence_score, explanation
+    result = diagnosis_label(class_labels[predicted_class_index])
+    explain_args = (image_path, img_array, predictions, grad_cam_data, result, confidence_score, cache_key)
+    if background:
+        return result, confidence_score, explanation_executor.submit(explain_prediction, *explain_args)
+    return result, confidence_score, explain_prediction(*explain_args)
 
 # Route for the main page (index.html)
 @app.route('/', methods=['GET', 'POST'])
@@ -148,11 +517,22 @@ def index():
         file = request.files['file']
         if file:
             # Save the file
-            file_location = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-            file.save(file_location)
+            file_location, image_bytes = save_upload(file)
 
             # Predict the tumor with explanation
-            result, confidence, explanation = predict_tumor_with_explanation(file_location)
+            background = explanation_executor is not None
+            result, confidence, explanation = predict_tumor_with_explanation(
+                file_location, image_bytes, background=background
+            )
+            sid = create_session(explanation)
+            explanation_pending = background and not explanation.done()
+            explanation_error = None
+            if background and not explanation_pending:
+                # A failed task is reported like /api/explain does, not re-raised
+                if explanation.exception() is not None:
+                    explanation_error = f"Explanation failed: {explanation.exception()}"
+                else:
+                    explanation = explanation.result()
 
             # Return result along with image path and explanation summary for display
             return render_template(
@@ -161,7 +541,10 @@ def index():
                 confidence=f"{confidence*100:.2f}%", 
                 file_path=f'/uploads/{file.filename}',
                 has_explanation=True,
-                explanation_summary={
+                explanation_pending=explanation_pending,
+                explanation_error=explanation_error,
+                sid=sid,
+                explanation_summary=None if explanation_pending or explanation_error else {
                     'predicted_class': explanation['decision_explanation']['predicted_class'],
                     'confidence_level': explanation['decision_explanation']['confidence_level'],
                     'reasoning': explanation['decision_explanation']['reasoning'],
@@ -171,26 +554,191 @@ def index():
 
     return render_template('index.html', result=None, has_explanation=False)
 
+@app.errorhandler(413)
+def upload_too_large(error):
+    return jsonify({
+        "error": f"Upload exceeds {UPLOAD_CONFIG['max_file_size'] // (1024 * 1024)}MB",
+        "status": "too_large"
+    }), 413
+
 # Route to serve uploaded files
 @app.route('/uploads/<filename>')
 def get_uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    if APP_CONFIG["upload_offload"] == "x-accel-redirect":
+        # nginx serves the file from its internal location; Python never reads it
+        location = safe_join(APP_CONFIG["upload_offload_location"], filename)
+        if location is None:
+            abort(404)
+        response = Response()
+        response.headers['X-Accel-Redirect'] = location
+        return response
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename, conditional=True)
 
-# API endpoint for getting full explanation JSON
-@app.route('/api/explain', methods=['GET'])
-def get_explanation():
+# API endpoint for queueing a prediction in the background
+@app.route('/api/predict_async', methods=['POST'])
+def predict_async():
     """
-    Returns the full explanation JSON for the last prediction
+    Queue an uploaded image for prediction and return a task ID to poll
     """
-    global current_explanation
+    if prediction_executor is None:
+        return jsonify({
+            "error": "Async processing is disabled",
+            "status": "disabled"
+        }), 404
+    
+    file = request.files.get('file')
+    if not file:
+        return jsonify({
+            "error": "No file provided",
+            "status": "invalid_input"
+        }), 400
+    
+    file_location, image_bytes = save_upload(file)
     
-    if current_explanation is None:
+    task_id = uuid.uuid4().hex
+    prediction_tasks[task_id] = prediction_executor.submit(
+        predict_tumor_with_explanation, file_location, image_bytes
+    )
+    
+    return jsonify({
+        "task_id": task_id,
+        "status": "queued"
+    }), 202
+
+# API endpoint for predicting several uploaded images at once
+@app.route('/api/predict_batch', methods=['POST'])
+def predict_batch():
+    """
+    Predict and explain the uploaded images with one forward pass and one Grad-CAM
+    pass per chunk of at most MAX_FORWARD_BATCH images (the sizes warmed up at startup)
+    """
+    files = [file for file in request.files.getlist('files') if file]
+    if not files:
         return jsonify({
-            "error": "No prediction available. Please upload an image first.",
-            "status": "no_data"
+            "error": "No files provided",
+            "status": "invalid_input"
+        }), 400
+    
+    image_paths = []
+    pixels = []
+    for file in files:
+        file_location, image_bytes = save_upload(file)
+        if image_bytes is None:
+            with open(file_location, "rb") as f:
+                image_bytes = f.read()
+        image_paths.append(file_location)
+        pixels.append(load_pixels(image_bytes))
+    
+    # Stack into one [N, H, W, C] batch; the baked model takes variable-size raw
+    # images, so batches always use the standard preprocessing
+    img_arrays = np.concatenate(pixels, axis=0)
+    chunks = [slice(start, start + MAX_FORWARD_BATCH) for start in range(0, len(img_arrays), MAX_FORWARD_BATCH)]
+    predictions = np.concatenate([predict_fn(img_arrays[chunk]) for chunk in chunks], axis=0)
+    
+    timestamp = datetime.now().isoformat()
+    preprocessing_logs = {
+        "resize": "128x128",
+        "normalization": "pixel values / 255.0",
+        "color_space": "RGB",
+        "location": PREPROCESSING_LOCATION,
+        "timestamp": timestamp
+    }
+    explanations = []
+    for chunk in chunks:
+        chunk_paths = image_paths[chunk]
+        explanations.extend(explainability_agent.generate_explanations_batch(
+            image_paths=chunk_paths,
+            img_arrays=img_arrays[chunk],
+            predictions_batch=predictions[chunk],
+            preprocessing_logs=[preprocessing_logs] * len(chunk_paths),
+            metadata=[
+                {"filename": os.path.basename(path), "file_path": path, "upload_time": timestamp}
+                for path in chunk_paths
+            ],
+            timestamp=timestamp
+        ))
+    
+    class_idxs = np.argmax(predictions, axis=1)
+    confidences = predictions[np.arange(len(class_idxs)), class_idxs]
+    return jsonify([
+        {
+            "filename": os.path.basename(path),
+            "result": diagnosis_label(class_labels[class_idx]),
+            "confidence": f"{confidence*100:.2f}%",
+            "sid": create_session(explanation),
+            "explanation": explanation
+        }
+        for path, class_idx, confidence, explanation
+        in zip(image_paths, class_idxs, confidences, explanations)
+    ]), 200
+
+# API endpoint for polling a queued prediction
+@app.route('/api/tasks/<task_id>', methods=['GET'])
+def get_task(task_id):
+    """
+    Returns the status of a queued prediction, and its result once finished
+    """
+    future = prediction_tasks.get(task_id)
+    if future is None:
+        return jsonify({
+            "error": "Unknown task",
+            "status": "not_found"
         }), 404
     
-    return jsonify(current_explanation), 200
+    if not future.done():
+        return jsonify({
+            "task_id": task_id,
+            "status": "running" if future.running() else "queued"
+        }), 202
+    
+    # Finished results are handed out once
+    del prediction_tasks[task_id]
+    error = future.exception()
+    if error is not None:
+        return jsonify({
+            "task_id": task_id,
+            "error": f"Prediction failed: {error}",
+            "status": "failed"
+        }), 500
+    
+    result, confidence, explanation = future.result()
+    return jsonify({
+        "task_id": task_id,
+        "status": "completed",
+        "sid": create_session(explanation),
+        "result": result,
+        "confidence": f"{confidence*100:.2f}%",
+        "explanation": explanation
+    }), 200
+
+# API endpoint for the quick question -> handler map
+@app.route('/api/quick_questions', methods=['GET'])
+def get_quick_questions():
+    """
+    Returns the quick questions and their handlers; cached clients get a 304
+    """
+    response = Response(QUICK_QUESTIONS_BYTES, mimetype='application/json')
+    response.set_etag(QUICK_QUESTIONS_ETAG)
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response.make_conditional(request)
+
+# API endpoint for getting full explanation JSON
+@app.route('/api/explain', methods=['GET'])
+def get_explanation():
+    """
+    Returns the full explanation JSON for the session's prediction
+    """
+    sid = request.args.get('sid')
+    agent, status = get_session(sid)
+    if agent is None:
+        return no_session_response()
+    if status == "processing":
+        return pending_session_response()
+    if status == "failed":
+        return failed_session_response(sid)
+    
+    return jsonify(agent.explanation_data), 200
 
 # API endpoint for clinical chat
 @app.route('/api/chat', methods=['POST'])
@@ -198,29 +746,49 @@ def clinical_chat():
     """
     Clinical chat endpoint - answers doctor questions based on explanation
     """
-    global current_explanation
-    
-    if current_explanation is None:
+    sid = request.args.get('sid')
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
         return jsonify({
-            "error": "No prediction available. Please upload an image first.",
-            "status": "no_data"
-        }), 404
-    
-    data = request.get_json()
-    question = data.get('question', '').strip()
+            "error": "Request body must be a JSON object",
+            "status": "invalid_input"
+        }), 400
+    question = data.get('question')
+    question = question.strip() if isinstance(question, str) else ''
+    handler = data.get('handler')  # Pre-bound handler for quick questions
     
+    if not sid:
+        return jsonify({
+            "error": "No session provided",
+            "status": "invalid_input"
+        }), 400
     if not question:
         return jsonify({
             "error": "No question provided",
             "status": "invalid_input"
         }), 400
+    if handler is not None and not isinstance(handler, str):
+        return jsonify({
+            "error": "Handler must be a string",
+            "status": "invalid_input"
+        }), 400
+    
+    agent, status = get_session(sid)
+    if agent is None:
+        return no_session_response()
+    if status == "processing":
+        return pending_session_response()
+    if status == "failed":
+        return failed_session_response(sid)
     
     # Get answer from clinical chat agent
-    response = clinical_chat_agent.answer_question(question)
+    response = agent.answer_question(question, handler=handler)
+    if should_log(LogChannel.CHAT) and logger.isEnabledFor(logging.INFO):
+        logger.info("chat question=%r grounded=%s", question, response.grounded)
     
     return jsonify({
         "question": question,
-        "response": response,
+        "response": response.to_dict(),
         "timestamp": datetime.now().isoformat()
     }), 200
 
@@ -230,7 +798,11 @@ def get_chat_history():
     """
     Get conversation history
     """
-    summary = clinical_chat_agent.get_conversation_summary()
+    agent = chat_sessions.get(request.args.get('sid'))
+    if agent is None:
+        return no_session_response()
+    
+    summary = agent.get_conversation_summary()
     return jsonify(summary), 200
 
 # Route to clear conversation
@@ -239,7 +811,11 @@ def clear_chat():
     """
     Clear conversation history
     """
-    clinical_chat_agent.clear_conversation()
+    agent = chat_sessions.get(request.args.get('sid'))
+    if agent is None:
+        return no_session_response()
+    
+    agent.clear_conversation()
     return jsonify({
         "status": "success",
         "message": "Conversation history cleared"
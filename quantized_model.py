@@ -0,0 +1,102 @@
+"""
+Optimized runtime wrappers for the Brain Tumor Detection model (TFLite INT8, TF-TRT)
+Expose the same predict() call as the Keras model used in main.py
+"""
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+
+class TFLiteClassifier:
+    """
+    Runs a (possibly INT8-quantized) TFLite classifier behind a Keras-style predict().
+    
+    The interpreter is not thread-safe, so invocations are serialized with a lock.
+    Integer-quantized inputs and outputs are (de)quantized using the tensor's
+    scale and zero point, so callers always pass and receive float32.
+    """
+    
+    def __init__(self, model_path: str, num_threads: int = None):
+        import tensorflow as tf
+        
+        # Use every core for the XNNPACK INT8 kernels unless told otherwise
+        self.interpreter = tf.lite.Interpreter(
+            model_path=model_path, num_threads=num_threads or os.cpu_count()
+        )
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._lock = threading.Lock()
+    
+    def _quantize(self, x: np.ndarray) -> np.ndarray:
+        """Convert a float32 input to the interpreter's input dtype"""
+        dtype = self._input["dtype"]
+        if dtype == np.float32:
+            return x.astype(np.float32, copy=False)
+        scale, zero_point = self._input["quantization"]
+        info = np.iinfo(dtype)
+        return np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(dtype)
+    
+    def _dequantize(self, y: np.ndarray) -> np.ndarray:
+        """Convert an interpreter output back to float32"""
+        if y.dtype == np.float32:
+            return y
+        scale, zero_point = self._output["quantization"]
+        return (y.astype(np.float32) - zero_point) * scale
+    
+    def predict(self, img_array: np.ndarray, **kwargs) -> np.ndarray:
+        """Predict class probabilities for a [B, H, W, C] batch"""
+        outputs = []
+        with self._lock:
+            # The converted model has a fixed batch size of 1
+            for sample in img_array:
+                self.interpreter.set_tensor(self._input["index"], self._quantize(sample[np.newaxis]))
+                self.interpreter.invoke()
+                outputs.append(self._dequantize(self.interpreter.get_tensor(self._output["index"])))
+        return np.concatenate(outputs, axis=0)
+
+
+def convert_to_tensorrt(model, trt_dir: str, precision_mode: str = "FP16"):
+    """
+    Convert a Keras model to a TF-TRT optimized SavedModel at trt_dir.
+    
+    The model is first exported as a plain SavedModel in a temporary directory,
+    since the converter works on SavedModels rather than .h5 files.
+    """
+    import tensorflow as tf
+    
+    with tempfile.TemporaryDirectory() as saved_model_dir:
+        if hasattr(model, "export"):
+            model.export(saved_model_dir)
+        else:
+            tf.saved_model.save(model, saved_model_dir)
+        converter = tf.experimental.tensorrt.Converter(
+            input_saved_model_dir=saved_model_dir,
+            conversion_params=tf.experimental.tensorrt.ConversionParams(precision_mode=precision_mode)
+        )
+        converter.convert()
+        converter.save(trt_dir)
+
+
+class TensorRTClassifier:
+    """
+    Runs a TF-TRT converted SavedModel behind a Keras-style predict().
+    
+    The serving signature is looked up once and called directly, skipping the
+    per-call overhead of Keras predict().
+    """
+    
+    def __init__(self, trt_dir: str):
+        import tensorflow as tf
+        
+        self._tf = tf
+        self._loaded = tf.saved_model.load(trt_dir)
+        self._fn = self._loaded.signatures["serving_default"]
+        self._input_name = next(iter(self._fn.structured_input_signature[1]))
+    
+    def predict(self, img_array: np.ndarray, **kwargs) -> np.ndarray:
+        """Predict class probabilities for a [B, H, W, C] batch"""
+        outputs = self._fn(**{self._input_name: self._tf.constant(img_array, dtype=self._tf.float32)})
+        return next(iter(outputs.values())).numpy()
@@ -0,0 +1,36 @@
+"""
+Bake resize + normalization into the model graph
+
+Usage:
+    python scripts/bake_preprocessing.py
+
+Writes a model that takes raw decoded uint8 pixels of any size and returns
+both the preprocessed [1, 128, 128, 3] image (used by the explainability agent)
+and the class probabilities, so main.py needs no NumPy preprocessing step.
+"""
+import os
+import sys
+
+import keras
+from keras.models import load_model
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import MODEL_CONFIG
+
+
+def main():
+    model = load_model(MODEL_CONFIG["model_path_fp32"])
+    size = MODEL_CONFIG["image_size"]
+    
+    raw = keras.Input((None, None, 3), dtype="uint8", name="raw_image")
+    x = keras.ops.cast(raw, "float32")
+    x = keras.layers.Resizing(size, size, name="resize")(x)
+    preprocessed = keras.layers.Rescaling(1.0 / 255, name="normalize")(x)
+    baked = keras.Model(raw, [preprocessed, model(preprocessed)], name="baked_model")
+    
+    baked.save(MODEL_CONFIG["model_path_baked"])
+    print(f"✓ Baked model written to {MODEL_CONFIG['model_path_baked']}")
+
+
+if __name__ == "__main__":
+    main()
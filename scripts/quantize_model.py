@@ -0,0 +1,56 @@
+"""
+Convert the trained Keras model to an INT8-quantized TFLite model
+
+Usage:
+    python scripts/quantize_model.py [calibration_image_dir ...]
+
+Calibration images default to the sample scans in the repository root and the
+uploads folder. The FP32 Keras model is kept for Grad-CAM, which needs gradients.
+"""
+import glob
+import itertools
+import os
+import sys
+
+import numpy as np
+import tensorflow as tf
+from keras.models import load_model
+from keras.preprocessing.image import load_img, img_to_array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import MODEL_CONFIG, UPLOAD_CONFIG
+
+
+def calibration_images(directories):
+    """Yield preprocessed calibration images the same way main.py preprocesses uploads"""
+    size = MODEL_CONFIG["image_size"]
+    for directory in directories:
+        for path in sorted(glob.glob(os.path.join(directory, "*"))):
+            if os.path.splitext(path)[1].lower() not in UPLOAD_CONFIG["allowed_extensions"]:
+                continue
+            img = img_to_array(load_img(path, target_size=(size, size))) / 255.0
+            yield np.expand_dims(img, axis=0).astype(np.float32)
+
+
+def main():
+    directories = sys.argv[1:] or [".", UPLOAD_CONFIG["upload_folder"]]
+    samples = list(itertools.islice(calibration_images(directories), MODEL_CONFIG["calibration_samples"]))
+    if not samples:
+        print("✗ No calibration images found")
+        sys.exit(1)
+    print(f"Calibrating with {len(samples)} images...")
+    
+    model = load_model(MODEL_CONFIG["model_path_fp32"])
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: ([sample] for sample in samples)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    tflite_model = converter.convert()
+    
+    with open(MODEL_CONFIG["model_path_int8"], "wb") as f:
+        f.write(tflite_model)
+    print(f"✓ Quantized model written to {MODEL_CONFIG['model_path_int8']}")
+
+
+if __name__ == "__main__":
+    main()